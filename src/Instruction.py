@@ -1,9 +1,26 @@
-class Instruction:
+class CommandType:
+    '''
+    Mimic enums for the commands an instruction can carry (parsed once from
+    the input file so that dispatching doesn't compare strings every cycle)
+    '''
+    INITIATE = 1
+    REQUEST = 2
+    RELEASE = 3
+    TERMINATE = 4
+
+    # Maps the command names used by input files to their enum values
+    byName = {"initiate":INITIATE, "request":REQUEST,
+              "release":RELEASE, "terminate":TERMINATE}
+
+
+class Instruction(object):
     '''
     Gathers all data pertaining to instructions and makes it available through
-    a number of getters. Note that an instruction is characterized by
+    its attributes. Note that an instruction is characterized by
     the variables in its constructor.
     '''
+    # Fixed set of attributes (no per-instance __dict__)
+    __slots__ = ('command', 'taskID', 'delay', 'resourceType', 'numUnits')
 
     def __init__(self, command, taskID, delay, resourceType, numUnits):
         self.command = command # Initiate, request, release or terminate
@@ -11,38 +28,3 @@ class Instruction:
         self.delay = delay # Determines when the instruction wants to "be run"
         self.resourceType = resourceType # Resource the instruction affects
         self.numUnits = numUnits # Number of units in given resource it affects
-
-    @property
-    def command(self):
-        '''
-        Gets the instruction's command
-        '''
-        return self.command
-
-    @property
-    def taskID(self):
-        '''
-        Gets the relevant task ID
-        '''
-        return self.taskID
-
-    @property
-    def delay(self):
-        '''
-        Gets the instruction's delay
-        '''
-        return self.delay
-
-    @property
-    def resourceType(self):
-        '''
-        Gets the relevant resource type
-        '''
-        return self.resourceType
-
-    @property
-    def numUnits(self):
-        '''
-        Gets the relevant number of units
-        '''
-        return self.numUnits
@@ -3,30 +3,47 @@
 import sys
 import re
 import copy
-from collections import OrderedDict
+import itertools
+import traceback
+from collections import deque
+from StringIO import StringIO
 
 from Task import Task
 from Resource import Resource
-from Instruction import Instruction
-
-
-# Maps all task IDs to all Task objects
-tasks = {}
-# Maps task IDs to waiting tasks (in order tasks were told to wait)
-waitingTasks = OrderedDict()
-# Tasks are placed here when they are freed from waiting
-# (makes sure tasks are only processed once per cycle)
-readyTasks = []
-
-# Maps resource IDs to Resource objects
-resources = {}
-# Maps resource IDs to number of units that will be freed.
+from Instruction import Instruction, CommandType
+
+
+# Indexed by task ID, all Task objects (index 0 is unused)
+tasks = []
+# Waiting tasks as (ticket, task) pairs, in order tasks were told to wait
+# (entries of tasks that stopped waiting are skipped and compacted lazily)
+waitingQueue = deque()
+# Maps task IDs of waiting tasks to the ticket of their entry in the queue
+waitingTasks = {}
+# Hands out a new ticket every time a task enters the waiting queue
+waitingTickets = itertools.count()
+
+# Indexed by resource ID, all Resource objects (index 0 is unused)
+resources = []
+# Indexed by resource ID, number of units that will be freed.
 # (freed units are placed here until the ends of the cycles)
-freeBuffer = {}
+freeBuffer = []
 
 # Reset for each run
 sysClock = 0;
 
+# Matches an instruction (command, task ID, delay, resource type, no. units)
+instructionPattern = re.compile(r'([a-z]+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)')
+
+# Number of tasks that are still active, and how many of those are waiting
+# (kept up to date on every state change so checks don't scan all tasks)
+activeCount = 0
+waitingCount = 0
+
+# Set whenever units are freed or a task stops being active, which are the
+# only events that can let a waiting task proceed on the next cycle
+waitersDirty = False
+
 class ManagerType:
     '''
     Mimic enums for required resource management algorithms
@@ -39,21 +56,23 @@ def parseInputData(outline, instructions):
     '''
     Reads data from input file and builds the 'resources' and 'tasks' structures
     '''
-    global tasks, resources # Modify the global variables
-    tasks = {x:Task(x) for x in range(1, outline[0] + 1)}
+    global tasks, resources, freeBuffer # Modify the global variables
+    tasks = [None] + [Task(x) for x in range(1, outline[0] + 1)]
 
-    numResources = outline[1] + 1
-    resources = {x:Resource(x, outline[x + 1]) for x in range(1, numResources)}
+    global activeCount, waitingCount, waitersDirty
+    activeCount = outline[0]; waitingCount = 0; waitersDirty = False
 
-    pat = re.compile('\w+')
-    for item in instructions:
-        matches = pat.findall(item)
+    numResources = outline[1] + 1
+    resources = [None] + [Resource(x, outline[x + 1])
+                          for x in range(1, numResources)]
+    freeBuffer = [0] * numResources # (index 0 is unused)
 
-        command     = matches[0]
-        taskID      = int(matches[1])
-        delay       = int(matches[2])
-        resourceType= int(matches[3])
-        numUnits    = int(matches[4])
+    for command, taskID, delay, resourceType, numUnits in instructions:
+        command     = CommandType.byName[command]
+        taskID      = int(taskID)
+        delay       = int(delay)
+        resourceType= int(resourceType)
+        numUnits    = int(numUnits)
 
         ins = Instruction(command, taskID, delay, resourceType, numUnits)
         tasks[taskID].addInstruction(ins)
@@ -63,11 +82,7 @@ def isFinished():
     '''
     True if there are no more active tasks in the process, false otherwise
     '''
-    for task in tasks.values():
-        if( task.isActive() ):
-            return False
-
-    return True
+    return activeCount == 0
 
 
 def isDeadlocked():
@@ -75,11 +90,62 @@ def isDeadlocked():
     True if all active tasks are waiting, false otherwise
     (relevant to the optimistic algorithm)
     '''
-    for task in tasks.values():
-        if( task.isActive() and not task.isWaiting() ):
-            return False
+    # If it's finished, it's not deadlocked
+    return activeCount > 0 and activeCount == waitingCount
 
-    return not isFinished() # If it's finished, it's not deadlocked
+
+def enterWaiting(task):
+    '''
+    Marks task as waiting and places it at the end of the waiting tasks
+    '''
+    global waitingCount
+    if task.isActive() and not task.isWaiting():
+        waitingCount += 1
+
+    task.wait()
+    if not task.id in waitingTasks:
+        ticket = next(waitingTickets)
+        waitingTasks[task.id] = ticket
+        waitingQueue.append((ticket, task))
+
+
+def leaveWaiting(task):
+    '''
+    Tells task to stop waiting and removes it from the waiting tasks
+    '''
+    global waitingCount, waitingQueue
+    if task.isActive() and task.isWaiting():
+        waitingCount -= 1
+
+    task.stopWaiting()
+    if task.id in waitingTasks:
+        del waitingTasks[task.id]
+
+        # Drop stale entries once they outnumber the live ones
+        if len(waitingQueue) > 2 * len(waitingTasks):
+            waitingQueue = deque(getWaitingEntries())
+
+
+def getWaitingEntries():
+    '''
+    Returns the live (ticket, task) entries of the waiting queue in the order
+    tasks were told to wait
+    '''
+    return [(ticket, task) for ticket, task in waitingQueue
+            if waitingTasks.get(task.id) == ticket]
+
+
+def abortTask(task):
+    '''
+    Aborts task (which releases its resources) and stops counting it as active
+    '''
+    global activeCount, waitersDirty
+    leaveWaiting(task)
+    if task.isActive():
+        activeCount -= 1
+        waitersDirty = True
+
+    task.abort()
 
 
 def isSafe(task, instruction):
@@ -98,13 +164,10 @@ def isSafe(task, instruction):
 
     # Abort task if it exceeds its claim
     if instruction.numUnits > task.getMaxAddl()[instruction.resourceType]:
-        if task.id in waitingTasks.keys():
-            del waitingTasks[task.id]
-
-        for rID in task.heldResources.keys():
-            placeIntoFreeBuffer(rID, task.heldResources[rID])
+        for rID, numUnits in task.heldResources.iteritems():
+            placeIntoFreeBuffer(rID, numUnits)
 
-        task.abort()
+        abortTask(task)
 
         # Print informative message
         msg =   "During cycle " + str(sysClock) + "-" + str(sysClock+1)
@@ -117,102 +180,106 @@ def isSafe(task, instruction):
 
 
     # Map resource ID to number of available units (copied structure)
-    simResources = {rID:r.numAvailableUnits for rID, r in resources.iteritems()}
-    # Map task ID to task object
-    simTasks = {}
-    for tID, t in tasks.iteritems():
-        if t.isActive():
-            simTasks[tID] = copy.deepcopy(t) # Copies full object
+    simResources = {r.id:r.numAvailableUnits for r in resources[1:]}
+    # Map IDs of active tasks to their max. additional requests (only counts
+    # are simulated, so the tasks themselves don't need to be copied)
+    simNeeds = {t.id:t.getMaxAddl() for t in tasks[1:] if t.isActive()}
 
     # Pretend to grant the request
     wResourceID = instruction.resourceType
     wUnits = instruction.numUnits
     simResources[wResourceID] -= wUnits
-    simTasks[task.id].grantResource(wResourceID, wUnits)
+    simNeeds[task.id][wResourceID] -= wUnits
 
-    while simTasks: # There should be tasks available
-        availTask = getFulfillableTask(simResources, simTasks)
+    while simNeeds: # There should be tasks available
+        availTaskID = getFulfillableTask(simResources, simNeeds)
 
-        if availTask: # Free its resources and delete it
-            for rID, units in availTask.heldResources.items():
-                simResources[rID] += units
-            del simTasks[availTask.id]
-        else:
+        if availTaskID is None:
             return False
 
+        # Free its resources (including the pretend grant) and delete it
+        for rID, units in tasks[availTaskID].heldResources.iteritems():
+            simResources[rID] += units
+        if availTaskID == task.id:
+            simResources[wResourceID] += wUnits
+        del simNeeds[availTaskID]
+
 
     return True
 
 
-def getFulfillableTask(maxResources, tasks):
+def getFulfillableTask(maxResources, needs):
     '''
-    Returns any task whose max. additional requests fit within the set of
-    currently available resources
+    Returns the ID of any task whose max. additional requests (given by
+    'needs', which maps task IDs to resource IDs to counts of units) fit
+    within the set of currently available resources, or None
     '''
-    for task in tasks.values():
-        resourceSet = task.getMaxAddl() # Maps resource ID to count of units
+    for taskID, resourceSet in needs.iteritems():
         isValid = True
 
-        for rID in resourceSet.keys():
+        for rID in resourceSet:
             if resourceSet[rID] > maxResources[rID]:
                 isValid = False; break
 
         if isValid:
-            return task
+            return taskID
 
     return None
 
 
-def getLowestDeadlockedTask():
+def getDeadlockedTasks():
     '''
-    Returns the lowest (in terms of task ID) active task in the blocked list
+    Returns the active tasks in the blocked list sorted by task ID
+    (when there's deadlock, these are all of the active tasks)
     '''
-    for task in tasks.values():
-        if( task.isWaiting() and task.isActive() ):
-            return task
-
-    return None
+    deadlocked = [task for ticket, task in getWaitingEntries() if task.active]
+    deadlocked.sort(key=lambda task: task.id)
+    return deadlocked
 
 
 def resolveDeadlock():
     '''
     Abort the lowest numbered deadlocked task (in terms of task ID) and free
     its resources). Repeat this process while there's deadlock.
+    Returns the tasks whose requests were granted here, which counts as
+    their turn on the next cycle.
     (Relevant to the optimistic algorithm).
     '''
+    grantedTasks = set()
+
     while( isDeadlocked() ):
-        task = getLowestDeadlockedTask()
-        if not task: return
+        deadlocked = getDeadlockedTasks()
+        if not deadlocked: break
 
+        task = deadlocked.pop(0) # Lowest numbered deadlocked task
         heldResources = task.heldResources
-        for rID in heldResources.keys():
-            placeIntoFreeBuffer(rID, heldResources[rID])
+        for rID, numUnits in heldResources.iteritems():
+            placeIntoFreeBuffer(rID, numUnits)
 
-        del waitingTasks[task.id]
-        task.abort()
+        abortTask(task)
 
         cleanFreeBuffer()
 
-        for task in tasks.values():
-            if task.isActive():
-                ins = task.getCurrentInstruction()
-                if(ins.command == "request"):
-                    standardRequest(task, ins)
-                    if( not task.isWaiting() ):
-                        task.incInstruction()
+        # Only the (blocked) remaining tasks can make use of the freed units
+        for task in deadlocked:
+            ins = task.getCurrentInstruction()
+            if(ins.command is CommandType.REQUEST):
+                standardRequest(task, ins)
+                if( not task.isWaiting() ):
+                    advanceTask(task)
+                    grantedTasks.add(task)
+
+    return grantedTasks
 
 
 def placeIntoFreeBuffer(resourceID, numUnits):
     '''
-    Inserts mappings of resource IDs to corresponding units into a "buffer"
-    that's emptied once per cycle
+    Adds units of the given resource to a "buffer" that's emptied once per
+    cycle
     '''
-    global freeBuffer
-
-    if( resourceID in freeBuffer.keys() ):
-        freeBuffer[resourceID] += numUnits
-    else:
-        freeBuffer[resourceID] = numUnits
+    global waitersDirty
+    freeBuffer[resourceID] += numUnits
+    waitersDirty = True
 
 
 def cleanFreeBuffer():
@@ -220,11 +287,10 @@ def cleanFreeBuffer():
     Places the units corresponding to given resource IDs in the "buffer" into
     the global structure of resources
     '''
-    global freeBuffer
-
-    for rID in freeBuffer.keys():
-        resources[rID].freeUnits(freeBuffer[rID])
-        del freeBuffer[rID]
+    for rID, numUnits in enumerate(freeBuffer):
+        if numUnits:
+            resources[rID].freeUnits(numUnits)
+            freeBuffer[rID] = 0
 
 
 def standardRequest(task, instruction):
@@ -235,25 +301,21 @@ def standardRequest(task, instruction):
     if( instruction.delay ): # Nothing to do for now
         instruction.delay -= 1; return
 
-    resource = resources[instruction.resourceType]
+    # Read the instruction's fields once
+    rType, numUnits = instruction.resourceType, instruction.numUnits
+    resource = resources[rType]
 
-    if( instruction.numUnits <= resource.numAvailableUnits ):
+    if( numUnits <= resource.numAvailableUnits ):
         # Units can be granted!
-        task.stopWaiting() # Freed from waiting when request can be satisfied
-        readyTasks.append(task) # Note that tasks were "readified" on this cycle
-
-        if task.id in waitingTasks: # Leave the waiting tasks
-            del waitingTasks[task.id]
+        leaveWaiting(task) # Freed from waiting when request can be satisfied
 
         # The request can be fulfilled
-        if( resource.takeUnits(instruction.numUnits) ):
-            task.grantResource(resource.id, instruction.numUnits)
+        if( resource.takeUnits(numUnits) ):
+            task.grantResource(rType, numUnits)
 
     else:
         # Units can't be granted
-        task.wait() # Wait until resources become available
-        if not task.id in waitingTasks: # Enter the waiting tasks
-            waitingTasks[task.id] = task
+        enterWaiting(task) # Wait until resources become available
 
 
 def bankerRequest(task, instruction):
@@ -264,9 +326,7 @@ def bankerRequest(task, instruction):
         standardRequest(task, instruction)
 
     else:
-        task.wait() # Wait until resources become available
-        if not task.id in waitingTasks: # Enter the waiting tasks
-            waitingTasks[task.id] = task
+        enterWaiting(task) # Wait until resources become available
 
 
 def bankerProcessClaims(task, initInstruction):
@@ -277,10 +337,10 @@ def bankerProcessClaims(task, initInstruction):
     rType = initInstruction.resourceType
     rUnits = initInstruction.numUnits
 
-    if( not rType in resources.keys()
+    if( not 0 < rType < len(resources)
         # Task is not getting accepted
         or rUnits > resources[rType].numTotUnits ):
-        task.abort()
+        abortTask(task)
 
         # Print informative message
         msg =   "Banker aborts task " + str(task.id) + \
@@ -294,6 +354,45 @@ def bankerProcessClaims(task, initInstruction):
         task.setClaims(rType, rUnits)
 
 
+def processInitiations(manager):
+    '''
+    Handles each task's leading initiate instructions before the run begins
+    so that execute() never has to dispatch them. Every initiate would have
+    taken one cycle plus its delay, which is added to the delay of the
+    task's first remaining instruction instead.
+    '''
+    # (cycle the initiate would have run on, task ID, task, instruction)
+    initiations = []
+
+    for task in tasks[1:]:
+        instructions = task.instructions
+        numInitiations = 0; numCycles = 0
+
+        while( numInitiations < len(instructions) and
+               instructions[numInitiations].command is CommandType.INITIATE ):
+            ins = instructions[numInitiations]
+            initiations.append((numCycles + ins.delay, task.id, task, ins))
+
+            numInitiations += 1
+            numCycles += ins.delay + 1
+
+        # Always leaves at least one instruction for the task to run (an
+        # initiate kept as the last one just takes up its cycle; its claim
+        # is still processed below)
+        numRemoved = min(numInitiations, len(instructions) - 1)
+        if numRemoved > 0:
+            instructions[numRemoved].delay += sum(ins.delay + 1
+                for ins in instructions[:numRemoved])
+            del instructions[:numRemoved]
+
+    if manager is ManagerType.BANKER: # Only the Banker cares about claims
+        # Same order as if they had been run cycle by cycle
+        initiations.sort(key=lambda initiation: initiation[:2])
+        for cycle, taskID, task, ins in initiations:
+            if task.isActive():
+                bankerProcessClaims(task, ins)
+
+
 def execute(manager, task, instruction):
     '''
     Dispatcher for each type of request that a task can make
@@ -301,11 +400,10 @@ def execute(manager, task, instruction):
     if( instruction.delay ): # Nothing to do for now
         instruction.delay -= 1; return
 
-    if( instruction.command == "initiate" and
-        manager is ManagerType.BANKER ): # Only the Banker cares about claims
-        bankerProcessClaims(task, instruction)
+    command = instruction.command # Read once for the dispatch below
 
-    if( instruction.command == "request" ):
+    # (initiate instructions were handled by processInitiations())
+    if( command is CommandType.REQUEST ):
         if( manager is ManagerType.OPTIMISTIC ):
             standardRequest(task, instruction)
 
@@ -313,20 +411,32 @@ def execute(manager, task, instruction):
             bankerRequest(task, instruction)
 
 
-    elif( instruction.command == "release" ):
-        resource = resources[instruction.resourceType]
+    elif( command is CommandType.RELEASE ):
+        rType, numUnits = instruction.resourceType, instruction.numUnits
         # Fulfill the release (place items into freeBuffer)
-        if( instruction.numUnits <= resource.numBusyUnits ):
-            placeIntoFreeBuffer(resource.id, instruction.numUnits)
-            task.releaseResource(resource.id, instruction.numUnits)
+        if( numUnits <= resources[rType].numBusyUnits ):
+            placeIntoFreeBuffer(rType, numUnits)
+            task.releaseResource(rType, numUnits)
 
 
     if task.isWaiting(): # Carry on and calculate stats
         task.incWaitingTime()
     else:
-        task.incInstruction()
-        if task.isFinished():
-            task.clockEndTime(sysClock)
+        advanceTask(task)
+
+
+def advanceTask(task):
+    '''
+    Moves task on to its next instruction and, if that was its last one,
+    marks the time it finished and stops counting it as active
+    '''
+    global activeCount, waitersDirty
+
+    task.incInstruction()
+    if task.isFinished():
+        task.clockEndTime(sysClock)
+        activeCount -= 1
+        waitersDirty = True
 
 
 def run(manager):
@@ -336,27 +446,47 @@ def run(manager):
     2. Process non-blocked tasks
     3. Check if there's deadlock (applies to optimistic manager)
     '''
-    global sysClock, readyTasks
+    global sysClock, waitersDirty
+
+    # Looked up once rather than on every cycle (the set of tasks is fixed)
+    taskList = tasks[1:]
+    isOptimistic = manager is ManagerType.OPTIMISTIC
+    # Tasks that already had their turn (when resolving the last deadlock)
+    grantedTasks = set()
 
     while not isFinished():
+        # Blocked tasks can't proceed unless something changed last cycle
+        waitersCanProceed = waitersDirty
+        waitersDirty = False
+
+        # Non-blocked tasks are picked before blocked ones can be freed
+        # (makes sure tasks are only processed once per cycle)
+        readyList = [task for task in taskList
+                     if task.active and not task.waiting
+                     and not task in grantedTasks]
+        grantedTasks = set()
+
         # Process blocked tasks in the order they were told to wait
-        for task in waitingTasks.values():
-            if task.isActive(): # Should be all
-                ins = task.getCurrentInstruction()
+        for ticket, task in getWaitingEntries():
+            if not task.active: # Should be none
+                continue
+
+            # A pending request for more units than are left can't be
+            # granted by either manager (its claims were already checked)
+            ins = task.getCurrentInstruction()
+            if( waitersCanProceed and
+                ins.numUnits <= resources[ins.resourceType].numAvailableUnits ):
                 execute(manager, task, ins)
+            else: # Its request would fail again, so carry on waiting
+                task.incWaitingTime()
 
         # Process non-blocked tasks
-        for task in tasks.values():
-            if( task.isActive() and not task.isWaiting()
-                and not task in readyTasks ):
-                ins = task.getCurrentInstruction()
-                execute(manager, task, ins)
-
-        readyTasks = [] # Reset ready tasks
+        for task in readyList:
+            execute(manager, task, task.getCurrentInstruction())
 
         # Check if there's deadlock (applies to optimistic manager)
-        if( manager is ManagerType.OPTIMISTIC and isDeadlocked() ):
-            resolveDeadlock()
+        if( isOptimistic and isDeadlocked() ):
+            grantedTasks = resolveDeadlock()
 
         # Freed units didn't go into 'resources', but in this buffer to make
         # sure that tasks don't use them more than one/cycle
@@ -370,16 +500,17 @@ def simulateAlgorithm(manager):
     initializing the execution of a given resource manager
     '''
     # Reset data structures
-    global tasks, waitingTasks, readyTasks
-    tasks = {}; waitingTasks = OrderedDict(); readyTasks = []
+    global tasks, waitingQueue, waitingTasks
+    tasks = []; waitingQueue = deque(); waitingTasks = {}
 
     global resources, freeBuffer
-    resources = {}; freeBuffer = {}
+    resources = []; freeBuffer = []
 
     global sysClock
     sysClock = 0
 
     parseInputData(outline, instructions)
+    processInitiations(manager)
     run(manager)
 
     return assembleStats(tasks, manager)
@@ -414,10 +545,10 @@ def assembleStats(tasks, manager):
             aborted: False
     '''
     vals = {"taken":0, "waiting":0, "percentWaiting":0, "aborted":False}
-    stats = {task.id:copy.deepcopy(vals) for task in tasks.values()}
+    stats = {task.id:copy.deepcopy(vals) for task in tasks[1:]}
 
     # Individual tasks
-    for taskID in stats.keys():
+    for taskID in stats:
         if tasks[taskID].isAborted():
             stats[taskID]['aborted'] = True
             continue
@@ -455,7 +586,7 @@ def printReport(globalStats):
     '''
     report = "\n"
     report += "\t"*3 + "FIFO" + "\t"*6 + "BANKER'S\n"
-    for i in range(1, len(globalStats[0].keys()) - 1):
+    for i in range(1, len(globalStats[0]) - 1):
         report += "\t" + "Task " + str(i)
 
         report += "\t"*2
@@ -508,6 +639,54 @@ def printReport(globalStats):
     print(report)
 
 
+def readInputData(file):
+    '''
+    Reads the outline of available resources and the tasks' instructions from
+    an open input file (used by simulateAlgorithm())
+    '''
+    global outline, instructions
+    outline = [int(s) for s in file.readline().split()]
+    # (each instruction is a tuple of the strings matched by the pattern)
+    instructions = instructionPattern.findall(file.read())
+
+
+def simulateInput(file):
+    '''
+    Reads an open input file, runs the optimistic and Banker's resource
+    managers on it and prints the report
+    '''
+    readInputData(file)
+
+    # Run for OPTIMISTIC and BANKER managers, and assemble stats
+    globalStats = []
+
+    globalStats.append( simulateAlgorithm(ManagerType.OPTIMISTIC) )
+    globalStats.append( simulateAlgorithm(ManagerType.BANKER) )
+
+    printReport(globalStats)
+
+
+def simulateFile(filePath):
+    '''
+    Wrapper around simulateInput() for a given input file that returns
+    everything that was printed, report included. If the simulation fails,
+    the output so far is followed by the traceback instead. Each call only
+    touches its own process' globals, so files can be simulated in parallel
+    (see Tester.py).
+    '''
+    output = StringIO()
+    stdout, sys.stdout = sys.stdout, output
+    try:
+        with open(filePath, 'r') as file:
+            simulateInput(file)
+    except Exception:
+        output.write(traceback.format_exc())
+    finally:
+        sys.stdout = stdout
+
+    return output.getvalue()
+
+
 if __name__ == "__main__":
     '''
     Reads data outlining available resources as well as tasks' instructions
@@ -524,18 +703,8 @@ if __name__ == "__main__":
         print("ex.:\n\tpython2.7 Manager.py input-02.txt\n")
         exit(0)
 
-    try: file = file(filePath, 'r')
+    try: file = open(filePath, 'r')
     except IOError: print("\nCan't find: '" + filePath + "'.\n"); exit(0)
 
-    # Read data from input file
-    global outline, instructions
-    outline = [int(s) for s in file.readline().split()]
-    instructions = re.findall(r'[a-z]+\s+[\d\s]+', file.read())
-
-    # Run for OPTIMISTIC and BANKER managers, and assemble stats
-    globalStats = []
-
-    globalStats.append( simulateAlgorithm(ManagerType.OPTIMISTIC) )
-    globalStats.append( simulateAlgorithm(ManagerType.BANKER) )
-
-    printReport(globalStats)
+    with file:
+        simulateInput(file)
@@ -1,9 +1,11 @@
-class Resource:
+class Resource(object):
     '''
     Gathers all data pertaining to resources and makes it available through
     a number of getters and setters. Note that a resource is mainly
     characterized by a unique ID and the number of units it holds.
     '''
+    # Fixed set of attributes (no per-instance __dict__)
+    __slots__ = ('id', 'numTotUnits', 'numAvailableUnits', 'numBusyUnits')
 
     def __init__(self, id, totUnits):
         self.id = id # Uniquely identifies it
@@ -12,34 +14,6 @@ class Resource:
         self.numAvailableUnits = totUnits # Available units within the resource
         self.numBusyUnits = 0 # Non-available units within the resource
 
-    @property
-    def id(self):
-        '''
-        Gets the resource's ID
-        '''
-        return self.id
-
-    @property
-    def numTotUnits(self):
-        '''
-        Gets the resources's total number of units
-        '''
-        return self.numTotUnits
-
-    @property
-    def numAvailableUnits(self):
-        '''
-        Gets the resource's total number of available units
-        '''
-        return self.numAvailableUnits
-
-    @property
-    def numBusyUnits(self):
-        '''
-        Gets the resource's total number of busy units
-        '''
-        return self.numBusyUnits
-
 
     def takeUnits(self, numUnits=1):
         '''
@@ -1,10 +1,14 @@
-class Task:
+class Task(object):
     '''
     Gathers all data pertaining to tasks and makes it available through
     a number of getters and setters. Note that a task is mainly characterized
     by a unique ID, a set of instructions and a state at a given point in
     time (active, waiting, aborted or finished).
     '''
+    # Fixed set of attributes (no per-instance __dict__)
+    __slots__ = ('id', 'instructions', 'currInstruction',
+                 'active', 'waiting', 'finished', 'aborted',
+                 'claims', 'heldResources', 'stats')
 
     def __init__(self, id):
         self.id = id # Uniquely identifies it
@@ -12,6 +16,9 @@ class Task:
         self.currInstruction = 0 # Used to iterate through instructions
 
         # State variables
+        # ('active' is kept equal to not (finished or aborted) so that the
+        # manager can read it directly)
+        self.active = True
         self.waiting = False
         self.finished = False
         self.aborted = False
@@ -28,35 +35,6 @@ class Task:
         self.stats = {'running':0, 'waiting':0}
 
 
-    @property
-    def id(self):
-        '''
-        Gets the task's ID
-        '''
-        return self.id
-
-    @property
-    def claims(self):
-        '''
-        Gets the tasks's claims
-        '''
-        return self.claims;
-
-    @property
-    def heldResources(self):
-        '''
-        Gets all of the task's resources
-        '''
-        return self.heldResources
-
-    @property
-    def stats(self):
-        '''
-        Gets the task's stats (useful if the waiting time has been
-        increased accordingly and that the end time was properly set)
-        '''
-        return self.stats
-
     def getCurrentInstruction(self):
         '''
         Uses the "current instruction pointer" to output the next
@@ -73,7 +51,7 @@ class Task:
         '''
         Determines if the task is still relevant to the execution
         '''
-        return not (self.isFinished() or self.isAborted())
+        return self.active
 
     def isWaiting(self):
         '''
@@ -113,6 +91,7 @@ class Task:
         self.releaseAllResources()
         self.stopWaiting()
         self.aborted = True
+        self.active = False
 
 
     def addInstruction(self, instruction):
@@ -129,6 +108,7 @@ class Task:
             self.currInstruction += 1
         else:
             self.finished = True
+            self.active = False
 
     def incWaitingTime(self):
         '''
@@ -158,14 +138,14 @@ class Task:
         (This method is useful only if claims are set at initialization).
         '''
         if resourceID:
-            if resourceID in heldResources.keys():
+            if resourceID in self.heldResources:
                 return self.claims[resourceID] - self.heldResources[resourceID]
             else:
                 return self.claims[resourceID]
         else:
             maxLeft = {rID:numUnits for rID, numUnits in self.claims.iteritems()}
-            for rID in maxLeft.keys():
-                if rID in self.heldResources.keys():
+            for rID in maxLeft:
+                if rID in self.heldResources:
                     maxLeft[rID] -= self.heldResources[rID]
             return maxLeft
 
@@ -175,7 +155,7 @@ class Task:
         Does not check if the resource actually has the units
         (that's the manager's job --this is just book-keeping)
         '''
-        if( resourceID in self.heldResources.keys() ):
+        if( resourceID in self.heldResources ):
             # Already have at least one unit of this resource
             self.heldResources[resourceID] += numUnits
         else:
@@ -185,7 +165,7 @@ class Task:
         '''
         Update records of currently held resources
         '''
-        if( resourceID in self.heldResources.keys() ):
+        if( resourceID in self.heldResources ):
             self.heldResources[resourceID] -= numUnits
 
     def releaseAllResources(self):
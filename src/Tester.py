@@ -0,0 +1,35 @@
+#!/usr/bin/python2.7
+
+import os
+import sys
+import multiprocessing
+
+from Manager import simulateFile
+
+
+if __name__ == "__main__":
+    '''
+    Simulates every input file in a given directory (inputs/ by default), one
+    file per CPU core, and prints each file's report in alphabetical order
+    (or its traceback, if that file's simulation failed). The simulations are
+    independent of each other, so they run in separate processes with nothing
+    shared between them.
+    '''
+    inputDir = sys.argv[1] if len(sys.argv) == 2 else "inputs"
+
+    try: fileNames = sorted(os.listdir(inputDir))
+    except OSError: print("\nCan't find: '" + inputDir + "'.\n"); exit(0)
+
+    filePaths = [os.path.join(inputDir, fileName) for fileName in fileNames]
+
+    pool = multiprocessing.Pool()
+    try:
+        reports = pool.map(simulateFile, filePaths)
+    finally:
+        pool.close()
+        pool.join()
+
+    for fileName, report in zip(fileNames, reports):
+        print("CURRENTLY TESTING " + fileName)
+        sys.stdout.write(report)
+        print("------------------------------")
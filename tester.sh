@@ -1,13 +1,5 @@
 #!/bin/bash
 clear
 
-TestFile() {
-  python2.7 src/Manager.py $1
-}
-
-for FILE in $(ls inputs)
-do
-  echo "CURRENTLY TESTING $FILE"
-  TestFile "inputs/$FILE"
-  echo "------------------------------"
-done
+# Simulates every file in inputs/ in parallel (one process per core)
+python2.7 src/Tester.py inputs